@@ -2,44 +2,201 @@
 Flask app to display MCQ quiz and show correct answers.
 """
 
+import os
 import random
 import sqlite3
+import threading
 
+from cachelib.file import FileSystemCache
 from flask import Flask, redirect, render_template, request, session, url_for
+from flask_session import Session
+
+from schema import migrate_database
 
 app = Flask(__name__)
 app.secret_key = "mcq-quiz-secret-key-change-in-production"
+# Keep quiz state server-side so only the session id travels in the cookie
+app.config["SESSION_TYPE"] = "cachelib"
+app.config["SESSION_CACHELIB"] = FileSystemCache(cache_dir="flask_session")
+# Keep the cookie a browser-session cookie, as with Flask's default sessions
+app.config["SESSION_PERMANENT"] = False
+Session(app)
+
+DB_PATH = "mcqs.db"
+
+# Questions are written once by main.py and only read here (apart from the
+# shared schema migration for older databases), so the parsed list is
+# memoized until the database file changes on disk.
+_CACHE = {"mtime": None, "data": None, "by_id": None}
+_CACHE_LOCK = threading.Lock()
+
+# Hot queries live at module level and run on each thread's long-lived
+# connection, so its statement cache reuses compiled statements across requests.
+# IN-list queries compile once per distinct list length.
+QUESTIONS_SQL_TEMPLATE = """
+    SELECT q.question_id, q.text, q.correct_option_id,
+           o.option_id, o.text, o.is_correct
+    FROM questions q
+    LEFT JOIN options o ON o.question_id = q.question_id
+    {where}
+    ORDER BY q.question_id, o.option_id
+"""
+ALL_QUESTIONS_SQL = QUESTIONS_SQL_TEMPLATE.format(where="")
+CORRECT_OPTION_SQL = "SELECT correct_option_id FROM questions WHERE question_id = ?"
+EXISTING_IDS_SQL_TEMPLATE = (
+    "SELECT question_id FROM questions WHERE question_id IN ({placeholders})"
+)
+
+
+# Each thread keeps its own read connection, so its pragmas, page cache and
+# statement cache survive across the requests that thread serves without
+# serializing reads across threads. If mcqs.db is replaced (e.g. deleted
+# and regenerated) the inode changes and the connection is reopened.
+_local = threading.local()
 
 
 def get_db_connection():
-    """Get a database connection."""
-    conn = sqlite3.connect("mcqs.db")
-    conn.row_factory = sqlite3.Row
+    """Get this thread's database connection, reopening it if the file changed."""
+    inode = os.stat(DB_PATH).st_ino
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.inode != inode:
+        if conn is not None:
+            conn.close()
+        conn = sqlite3.connect(DB_PATH, cached_statements=256, isolation_level=None)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        # Read-heavy workload: map the file and keep pages cached in memory
+        conn.execute("PRAGMA mmap_size=268435456")
+        conn.execute("PRAGMA cache_size=-20000")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        migrate_database(conn)
+        _local.conn = conn
+        _local.inode = inode
     return conn
 
 
+def query_db(sql, params=()):
+    """Run a read query on this thread's connection and return all rows."""
+    return get_db_connection().execute(sql, params).fetchall()
+
+
+def _db_mtime():
+    """Modification time of the database, including any pending WAL writes."""
+    mtime = os.stat(DB_PATH).st_mtime_ns
+    try:
+        return mtime, os.stat(DB_PATH + "-wal").st_mtime_ns
+    except FileNotFoundError:
+        return mtime, None
+
+
 def get_all_questions():
-    """Fetch all questions with their options from the database."""
-    conn = get_db_connection()
+    """Fetch all questions with their options, cached until the DB changes."""
+    mtime = _db_mtime()
+    with _CACHE_LOCK:
+        if _CACHE["mtime"] == mtime:
+            return _CACHE["data"]
+
+        by_id = _load_questions()
+        _CACHE["mtime"] = mtime
+        _CACHE["data"] = list(by_id.values())
+        _CACHE["by_id"] = by_id
+        return _CACHE["data"]
+
+
+def get_questions_by_ids(question_ids):
+    """Fetch the given questions in the given order, skipping unknown ids."""
+    mtime = _db_mtime()
+    with _CACHE_LOCK:
+        by_id = _CACHE["by_id"] if _CACHE["mtime"] == mtime else None
+
+    # Without a fresh cache, only load the questions we actually need
+    if by_id is None:
+        by_id = _load_questions(question_ids)
+
+    return [by_id[qid] for qid in question_ids if qid in by_id]
+
+
+def get_existing_question_ids(question_ids):
+    """Filter question ids down to those still in the DB, keeping their order."""
+    mtime = _db_mtime()
+    with _CACHE_LOCK:
+        existing = _CACHE["by_id"] if _CACHE["mtime"] == mtime else None
+
+    # Without a fresh cache, check the ids alone rather than loading questions
+    if existing is None:
+        placeholders = ",".join("?" * len(question_ids))
+        existing = {
+            row[0]
+            for row in query_db(
+                EXISTING_IDS_SQL_TEMPLATE.format(placeholders=placeholders),
+                tuple(question_ids),
+            )
+        }
+
+    return [qid for qid in question_ids if qid in existing]
+
+
+def get_session_questions():
+    """Fetch the current attempt's questions in quiz order."""
+    # Only load the session's questions (shuffled or retrying wrong ones)
+    question_ids = session.get("question_ids")
+    if question_ids:
+        return get_questions_by_ids(question_ids)
+    return get_all_questions()
 
-    questions = conn.execute("SELECT * FROM questions ORDER BY question_id").fetchall()
 
-    result = []
-    for q in questions:
-        options = conn.execute(
-            "SELECT * FROM options WHERE question_id = ? ORDER BY option_id",
-            (q["question_id"],),
-        ).fetchall()
-        result.append(
-            {
-                "question_id": q["question_id"],
-                "text": q["text"],
-                "options": [dict(o) for o in options],
-            }
+def get_correct_option(question_id):
+    """Fetch only the correct option id for a single question."""
+    rows = query_db(CORRECT_OPTION_SQL, (question_id,))
+    return rows[0][0] if rows else None
+
+
+def _load_questions(question_ids=None):
+    """Fetch questions with their options from the database, keyed by id."""
+    if question_ids is None:
+        rows = query_db(ALL_QUESTIONS_SQL)
+    else:
+        placeholders = ",".join("?" * len(question_ids))
+        rows = query_db(
+            QUESTIONS_SQL_TEMPLATE.format(
+                where=f"WHERE q.question_id IN ({placeholders})"
+            ),
+            tuple(question_ids),
         )
 
-    conn.close()
-    return result
+    # Group the joined rows back into one entry per question. Rows are plain
+    # tuples, so unpack them by position instead of looking up column names.
+    questions = {}
+    for (
+        question_id,
+        question_text,
+        correct_option_id,
+        option_id,
+        option_text,
+        is_correct,
+    ) in rows:
+        q = questions.get(question_id)
+        if q is None:
+            q = questions[question_id] = {
+                "question_id": question_id,
+                "text": question_text,
+                "correct_option_id": correct_option_id,
+                "correct_option": None,
+                "options": [],
+                "options_by_id": {},
+            }
+        if option_id is not None:
+            option = {
+                "option_id": option_id,
+                "question_id": question_id,
+                "text": option_text,
+                "is_correct": is_correct,
+            }
+            q["options"].append(option)
+            q["options_by_id"][option_id] = option
+            if option_id == correct_option_id:
+                q["correct_option"] = option
+
+    return questions
 
 
 @app.route("/")
@@ -60,80 +217,73 @@ def index():
 @app.route("/question", methods=["GET", "POST"])
 def question():
     """Display current question and handle answer submission."""
-    all_questions = get_all_questions()
+    question_ids = session.get("question_ids")
+    current_idx = session.get("current_question", 0)
 
-    if not all_questions:
-        return render_template("no_questions.html")
+    # Answering only needs the current question's id, not the question list.
+    # Index the same filtered ids the GET renders from, so stale ids left in
+    # the session by a regenerated database can't shift the answer.
+    if request.method == "POST" and question_ids:
+        question_ids = get_existing_question_ids(question_ids)
+        if current_idx < len(question_ids):
+            return handle_answer(question_ids[current_idx], current_idx)
 
-    # Filter questions if retrying wrong ones
-    question_ids = session.get("question_ids")
-    if question_ids:
-        # Create a map for quick lookup and preserve order from question_ids
-        q_map = {q["question_id"]: q for q in all_questions}
-        questions = [q_map[qid] for qid in question_ids if qid in q_map]
-    else:
-        questions = all_questions
+    questions = get_session_questions()
 
     if not questions:
         return render_template("no_questions.html")
 
-    current_idx = session.get("current_question", 0)
-
     if current_idx >= len(questions):
         return redirect(url_for("results"))
 
     current_q = questions[current_idx]
-    show_answer = session.get("show_answer", False)
-    selected_option = session.get("selected_option")
-
-    # Find correct option early so it's available in POST handling
-    correct_option = None
-    for opt in current_q["options"]:
-        if opt["is_correct"]:
-            correct_option = opt["option_id"]
-            break
 
     if request.method == "POST":
-        action = request.form.get("action")
-
-        if action == "submit":
-            # User submitted an answer
-            selected = request.form.get("answer")
-            if selected:
-                session["selected_option"] = int(selected)
-                session["show_answer"] = True
-                # Store the answer
-                answers = session.get("answers", {})
-                answers[str(current_q["question_id"])] = int(selected)
-                session["answers"] = answers
-                # Update local variables to reflect the new state
-                selected_option = int(selected)
-                show_answer = True
-
-        elif action == "next":
-            # Track wrong answer before moving on
-            if selected_option and selected_option != correct_option:
-                wrong_questions = session.get("wrong_questions", [])
-                if current_q["question_id"] not in wrong_questions:
-                    wrong_questions.append(current_q["question_id"])
-                    session["wrong_questions"] = wrong_questions
-            # Move to next question
-            session["current_question"] = current_idx + 1
-            session["show_answer"] = False
-            session["selected_option"] = None
-            return redirect(url_for("question"))
+        return handle_answer(current_q["question_id"], current_idx)
 
     return render_template(
         "question.html",
         question=current_q,
         question_num=current_idx + 1,
         total_questions=len(questions),
-        show_answer=show_answer,
-        selected_option=selected_option,
-        correct_option=correct_option,
+        show_answer=session.get("show_answer", False),
+        selected_option=session.get("selected_option"),
+        correct_option=current_q["correct_option_id"],
     )
 
 
+def handle_answer(question_id, current_idx):
+    """Record a submitted answer or advance past the current question."""
+    action = request.form.get("action")
+
+    if action == "submit":
+        # User submitted an answer
+        selected = request.form.get("answer")
+        if selected:
+            session["selected_option"] = int(selected)
+            session["show_answer"] = True
+            # Store the answer
+            answers = session.get("answers", {})
+            answers[str(question_id)] = int(selected)
+            session["answers"] = answers
+
+    elif action == "next":
+        # Track wrong answer before moving on
+        selected_option = session.get("selected_option")
+        if selected_option and selected_option != get_correct_option(question_id):
+            wrong_questions = session.get("wrong_questions", [])
+            # Only touch the session when the id is new
+            if question_id not in wrong_questions:
+                session["wrong_questions"] = wrong_questions + [question_id]
+        # Move to next question
+        session["current_question"] = current_idx + 1
+        session["show_answer"] = False
+        session["selected_option"] = None
+
+    # Render the (possibly updated) question from a fresh GET
+    return redirect(url_for("question"))
+
+
 @app.route("/retry-wrong")
 def retry_wrong():
     """Start a quiz with only the questions the user got wrong."""
@@ -152,32 +302,18 @@ def retry_wrong():
 @app.route("/results")
 def results():
     """Show final quiz results."""
-    all_questions = get_all_questions()
     answers = session.get("answers", {})
     wrong_questions = session.get("wrong_questions", [])
 
-    # Filter questions if we were doing a retry
-    question_ids = session.get("question_ids")
-    if question_ids:
-        # Create a map for quick lookup and preserve order from question_ids
-        q_map = {q["question_id"]: q for q in all_questions}
-        questions = [q_map[qid] for qid in question_ids if qid in q_map]
-    else:
-        questions = all_questions
+    questions = get_session_questions()
 
     correct_count = 0
     question_results = []
 
     for q in questions:
         selected_id = answers.get(str(q["question_id"]))
-        correct_option = None
-        selected_option = None
-
-        for opt in q["options"]:
-            if opt["is_correct"]:
-                correct_option = opt
-            if opt["option_id"] == selected_id:
-                selected_option = opt
+        correct_option = q["correct_option"]
+        selected_option = q["options_by_id"].get(selected_id)
 
         is_correct = selected_option and selected_option["is_correct"]
         if is_correct:
@@ -2,17 +2,25 @@
 MCQ Generator - Generate multiple choice questions from documents using Gemini API.
 """
 
+import contextlib
+import multiprocessing
+import os
 import pathlib
+import posixpath
 import sqlite3
 import sys
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from typing import List
 
 from dotenv import load_dotenv
 from google import genai
 from google.genai import types
-from pptx import Presentation
+from lxml import etree
 from pydantic import BaseModel, Field
 
+from schema import migrate_database, update_correct_options
+
 load_dotenv()
 # ============================================================================
 # Pydantic Models for Structured Output
@@ -47,6 +55,10 @@ class MCQResponse(BaseModel):
     )
 
 
+# The schema never changes, so build it once instead of on every API call
+MCQ_RESPONSE_SCHEMA = MCQResponse.model_json_schema()
+
+
 # ============================================================================
 # Database Operations
 # ============================================================================
@@ -57,12 +69,16 @@ def init_database(db_path: str = "mcqs.db") -> sqlite3.Connection:
     conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
 
+    # WAL is persistent, so the quiz app's readers never block on this writer
+    cursor.execute("PRAGMA journal_mode=WAL")
+
     # Create questions table
     cursor.execute(
         """
         CREATE TABLE IF NOT EXISTS questions (
             question_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            text TEXT NOT NULL
+            text TEXT NOT NULL,
+            correct_option_id INTEGER
         )
     """
     )
@@ -80,7 +96,18 @@ def init_database(db_path: str = "mcqs.db") -> sqlite3.Connection:
     """
     )
 
+    # Index options by question so per-question lookups avoid a full scan
+    cursor.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_options_qid_oid
+        ON options (question_id, option_id)
+    """
+    )
+
     conn.commit()
+
+    # Migrate databases created before correct_option_id existed
+    migrate_database(conn)
     return conn
 
 
@@ -98,18 +125,23 @@ def clear_database(conn: sqlite3.Connection) -> None:
 def save_questions_to_db(conn: sqlite3.Connection, mcq_response: MCQResponse) -> None:
     """Save generated questions and options to the database."""
     cursor = conn.cursor()
+    cursor.execute("BEGIN IMMEDIATE")
 
+    # Insert questions, collecting their options for a single batched insert
+    option_rows = []
     for question in mcq_response.questions:
-        # Insert question
         cursor.execute("INSERT INTO questions (text) VALUES (?)", (question.text,))
         question_id = cursor.lastrowid
+        option_rows.extend(
+            (question_id, option.text, 1 if option.is_correct else 0)
+            for option in question.options
+        )
 
-        # Insert options
-        for option in question.options:
-            cursor.execute(
-                "INSERT INTO options (question_id, text, is_correct) VALUES (?, ?, ?)",
-                (question_id, option.text, 1 if option.is_correct else 0),
-            )
+    cursor.executemany(
+        "INSERT INTO options (question_id, text, is_correct) VALUES (?, ?, ?)",
+        option_rows,
+    )
+    update_correct_options(cursor)
 
     conn.commit()
 
@@ -146,27 +178,66 @@ def get_mime_type(file_path: pathlib.Path) -> str:
     return mime_types.get(extension, "text/plain")
 
 
+DRAWINGML_NS = "{http://schemas.openxmlformats.org/drawingml/2006/main}"
+PRESENTATIONML_NS = "{http://schemas.openxmlformats.org/presentationml/2006/main}"
+RELATIONSHIPS_NS = (
+    "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+)
+PACKAGE_RELATIONSHIPS_NS = (
+    "{http://schemas.openxmlformats.org/package/2006/relationships}"
+)
+
+
+def get_slide_paths(pptx: zipfile.ZipFile) -> List[str]:
+    """List the archive paths of a deck's slides in presentation order."""
+    with pptx.open("ppt/_rels/presentation.xml.rels") as rels_xml:
+        targets = {
+            rel.get("Id"): rel.get("Target")
+            for rel in etree.parse(rels_xml).iter(
+                f"{PACKAGE_RELATIONSHIPS_NS}Relationship"
+            )
+        }
+
+    # <p:sldIdLst> holds the deck order; part names like slide3.xml don't
+    with pptx.open("ppt/presentation.xml") as presentation_xml:
+        rel_ids = [
+            slide_id.get(f"{RELATIONSHIPS_NS}id")
+            for slide_id in etree.parse(presentation_xml).iter(
+                f"{PRESENTATIONML_NS}sldId"
+            )
+        ]
+
+    # Targets are relative to ppt/ unless they are absolute package paths
+    return [
+        targets[rel_id].lstrip("/")
+        if targets[rel_id].startswith("/")
+        else posixpath.normpath(posixpath.join("ppt", targets[rel_id]))
+        for rel_id in rel_ids
+    ]
+
+
 def extract_text_from_pptx(file_path: pathlib.Path) -> str:
-    """Extract all text content from a PowerPoint file."""
-    prs = Presentation(str(file_path))
+    """
+    Extract all text content from a PowerPoint file.
+
+    Slide XML is streamed straight out of the .pptx archive and only the
+    paragraph text is kept, which covers both text frames and table cells.
+    """
     text_parts = []
 
-    for slide_num, slide in enumerate(prs.slides, 1):
-        slide_texts = [f"--- Slide {slide_num} ---"]
-        for shape in slide.shapes:
-            if shape.has_text_frame:
-                for paragraph in shape.text_frame.paragraphs:
-                    text = "".join(run.text for run in paragraph.runs).strip()
+    with zipfile.ZipFile(file_path) as pptx:
+        for slide_num, slide_path in enumerate(get_slide_paths(pptx), 1):
+            slide_texts = [f"--- Slide {slide_num} ---"]
+            with pptx.open(slide_path) as slide_xml:
+                for _, paragraph in etree.iterparse(
+                    slide_xml, events=("end",), tag=f"{DRAWINGML_NS}p"
+                ):
+                    text = "".join(paragraph.itertext(f"{DRAWINGML_NS}t")).strip()
                     if text:
                         slide_texts.append(text)
-            # Also extract text from tables
-            if shape.has_table:
-                for row in shape.table.rows:
-                    for cell in row.cells:
-                        if cell.text.strip():
-                            slide_texts.append(cell.text.strip())
-        if len(slide_texts) > 1:  # More than just the slide header
-            text_parts.append("\n".join(slide_texts))
+                    paragraph.clear()
+            if len(slide_texts) > 1:  # More than just the slide header
+                text_parts.append("\n".join(slide_texts))
 
     return "\n\n".join(text_parts)
 
@@ -198,6 +269,44 @@ def prepare_file_content(file_path: str) -> types.Part:
     return types.Part.from_bytes(data=file_content, mime_type=mime_type)
 
 
+def prepare_file_contents(file_paths: List[str]) -> List[types.Part]:
+    """
+    Prepare several files as Parts concurrently, preserving their order.
+
+    PPTX text extraction is CPU-bound so it runs in worker processes; other
+    files are plain disk reads and go through a thread pool.
+
+    Args:
+        file_paths: List of paths to document files
+
+    Returns:
+        List of types.Part in the same order as file_paths
+    """
+    is_pptx = [pathlib.Path(fp).suffix.lower() == ".pptx" for fp in file_paths]
+    num_pptx = sum(is_pptx)
+
+    # Spawn rather than fork: the thread pool may already be running, and
+    # forking a multi-threaded process can deadlock.
+    process_pool = (
+        ProcessPoolExecutor(
+            max_workers=min(os.cpu_count() or 1, num_pptx),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        if num_pptx
+        else contextlib.nullcontext()
+    )
+
+    with (
+        ThreadPoolExecutor(max_workers=min(8, len(file_paths))) as thread_pool,
+        process_pool,
+    ):
+        futures = [
+            (process_pool if pptx else thread_pool).submit(prepare_file_content, fp)
+            for fp, pptx in zip(file_paths, is_pptx)
+        ]
+        return [future.result() for future in futures]
+
+
 def generate_mcqs_from_files(
     file_paths: List[str], num_questions: int = 10
 ) -> MCQResponse:
@@ -218,7 +327,7 @@ def generate_mcqs_from_files(
     client = genai.Client()
 
     # Prepare all file contents
-    file_parts = [prepare_file_content(fp) for fp in file_paths]
+    file_parts = prepare_file_contents(file_paths)
 
     # Create the prompt
     doc_word = "document" if len(file_paths) == 1 else "documents"
@@ -242,7 +351,7 @@ Generate diverse questions covering different topics and difficulty levels from
         config=types.GenerateContentConfig(
             system_instruction=MCQ_SYSTEM_PROMPT,
             response_mime_type="application/json",
-            response_json_schema=MCQResponse.model_json_schema(),
+            response_json_schema=MCQ_RESPONSE_SCHEMA,
             thinking_config=types.ThinkingConfig(
                 thinking_budget=32000,
             ),
@@ -0,0 +1,33 @@
+"""
+Schema helpers shared by the MCQ generator and the quiz app.
+"""
+
+import sqlite3
+
+
+def update_correct_options(cursor: sqlite3.Cursor) -> None:
+    """Fill in correct_option_id for questions that don't have it yet."""
+    cursor.execute(
+        """
+        UPDATE questions SET correct_option_id = (
+            SELECT option_id FROM options
+            WHERE options.question_id = questions.question_id AND is_correct = 1
+            ORDER BY option_id
+            LIMIT 1
+        )
+        WHERE correct_option_id IS NULL
+    """
+    )
+
+
+def migrate_database(conn: sqlite3.Connection) -> None:
+    """Add and backfill correct_option_id on databases created before it."""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(questions)")}
+    if not columns or "correct_option_id" in columns:
+        return
+
+    cursor = conn.cursor()
+    cursor.execute("BEGIN IMMEDIATE")
+    cursor.execute("ALTER TABLE questions ADD COLUMN correct_option_id INTEGER")
+    update_correct_options(cursor)
+    cursor.execute("COMMIT")